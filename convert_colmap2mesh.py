@@ -9,6 +9,7 @@ Usage:
     python convert_colmap2mesh.py --scene_dir /path/to/scene
     python convert_colmap2mesh.py --scene_dir /path/to/scene --no_texture
     python convert_colmap2mesh.py --scene_dir /path/to/scene --max_face_area 32
+    python convert_colmap2mesh.py --scene_dirs /path/to/scene1 /path/to/scene2 --num_gpus 2
 
 Requirements:
     - OpenMVS installed and available in PATH (InterfaceCOLMAP, DensifyPointCloud, etc.)
@@ -20,22 +21,34 @@ import subprocess
 import os
 import sys
 import json
+import queue
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pycolmap
 
+# COLMAP binary model files (rigs/frames only exist in newer COLMAP versions)
+MODEL_FILES = ("cameras.bin", "images.bin", "points3D.bin", "rigs.bin", "frames.bin")
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
         description="Convert COLMAP sparse reconstruction to mesh using OpenMVS"
     )
-    parser.add_argument(
+    scene_group = parser.add_mutually_exclusive_group(required=True)
+    scene_group.add_argument(
         "--scene_dir",
         type=str,
-        required=True,
         help="Directory containing COLMAP sparse reconstruction"
     )
+    scene_group.add_argument(
+        "--scene_dirs",
+        type=str,
+        nargs="+",
+        help="Multiple scene directories to process in batch mode"
+    )
     parser.add_argument(
         "--no_texture",
         action="store_true",
@@ -63,6 +76,30 @@ def parse_args():
         action="store_true",
         help="Keep intermediate files (dense folder, etc.)"
     )
+    parser.add_argument(
+        "--max_threads",
+        type=int,
+        default=os.cpu_count(),
+        help="Maximum number of threads for each OpenMVS process (default: all cores)"
+    )
+    parser.add_argument(
+        "--num_gpus",
+        type=int,
+        default=1,
+        help="Number of GPUs used to process scenes concurrently in batch mode (default: 1)"
+    )
+    parser.add_argument(
+        "--resolution_level",
+        type=int,
+        default=1,
+        help="Image downscale level for DensifyPointCloud (default: 1)"
+    )
+    parser.add_argument(
+        "--number_views",
+        type=int,
+        default=4,
+        help="Number of views used for depth-map estimation in DensifyPointCloud (default: 4)"
+    )
     return parser.parse_args()
 
 
@@ -77,10 +114,22 @@ def check_dependencies():
         "TextureMesh"
     ]
     
-    missing = []
-    for cmd in required_commands:
-        if shutil.which(cmd) is None:
-            missing.append(cmd)
+    # List every PATH directory once instead of probing each command separately,
+    # then only check the matching entries are executable files like shutil.which
+    file_names = {name: cmd for cmd in required_commands for name in (cmd, cmd + ".exe")}
+    available = set()
+    for path_dir in os.environ.get("PATH", "").split(os.pathsep):
+        path_dir = path_dir or "."
+        try:
+            matches = file_names.keys() & set(os.listdir(path_dir))
+        except OSError:
+            continue
+        for name in matches:
+            path = os.path.join(path_dir, name)
+            if os.access(path, os.X_OK) and not os.path.isdir(path):
+                available.add(file_names[name])
+    
+    missing = [cmd for cmd in required_commands if cmd not in available]
     
     if missing:
         print("Error: The following required commands are not found in PATH:")
@@ -90,8 +139,10 @@ def check_dependencies():
         sys.exit(1)
 
 
-def run_command(cmd, cwd=None, description=""):
+def run_command(cmd, cwd=None, description="", extra_args=None, env=None):
     """Run a shell command and handle errors."""
+    cmd = list(cmd) + list(extra_args or [])
+
     if description:
         print(f"\n{'='*80}")
         print(f"{description}")
@@ -100,15 +151,21 @@ def run_command(cmd, cwd=None, description=""):
     print(f"Running: {' '.join(cmd)}")
     print(f"Working directory: {cwd if cwd else os.getcwd()}")
     
-    result = subprocess.run(
+    # Stream output line by line instead of buffering the whole log
+    proc = subprocess.Popen(
         cmd,
         cwd=cwd,
-        check=True,
+        env=env,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        text=True
+        text=True,
+        bufsize=1
     )
-    print(result.stdout)
+    for line in proc.stdout:
+        sys.stdout.write(line)
+    returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd)
     return True
 
 
@@ -123,10 +180,12 @@ def validate_input_structure(scene_dir):
         sys.exit(1)
     
     # Count images
-    image_extensions = [".jpg", ".jpeg", ".png", ".JPG", ".JPEG", ".PNG"]
-    image_files = []
-    for ext in image_extensions:
-        image_files.extend(list(images_dir.glob(f"*{ext}")))
+    image_extensions = {".jpg", ".jpeg", ".png"}
+    with os.scandir(images_dir) as it:
+        image_files = [
+            entry.name for entry in it
+            if os.path.splitext(entry.name)[1].lower() in image_extensions
+        ]
     
     if len(image_files) == 0:
         print(f"Error: No images found in {images_dir}")
@@ -163,6 +222,7 @@ def convert_cameras_to_pinhole(sparse_dir, output_dir):
     """Convert camera models to PINHOLE format for OpenMVS."""
     print("Converting cameras to PINHOLE model...")
     reconstruction = pycolmap.Reconstruction(str(sparse_dir))
+    changed = False
 
     for cam_id, camera in reconstruction.cameras.items():
         model_name = _camera_model_name(camera)
@@ -194,10 +254,32 @@ def convert_cameras_to_pinhole(sparse_dir, output_dir):
                 camera_id=int(cam_id),
             )
             reconstruction.cameras[cam_id] = new_camera
+            changed = True
         else:
             print(f"  Camera {cam_id} is already PINHOLE model")
 
     os.makedirs(output_dir, exist_ok=True)
+
+    # Unlink old outputs first: they may be hard links to the original model,
+    # which reconstruction.write would otherwise overwrite in place
+    for entry in Path(output_dir).iterdir():
+        if entry.is_file() or entry.is_symlink():
+            entry.unlink()
+
+    if not changed:
+        # Nothing to rewrite: link the original model files instead of re-serializing
+        for name in MODEL_FILES:
+            src = Path(sparse_dir) / name
+            if not src.is_file():
+                continue
+            dst = Path(output_dir) / name
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+        print(f"  All cameras already PINHOLE, linked original model to {output_dir}")
+        return True
+
     reconstruction.write(str(output_dir))
     print(f"  Saved PINHOLE cameras to {output_dir}")
     return True
@@ -225,7 +307,14 @@ def step_undistort_images(scene_dir, dense_dir):
         if dense_images_dir.is_symlink():
             dense_images_dir.unlink()
         else:
-            shutil.rmtree(dense_images_dir)
+            # Move the real directory out of the way with a single rename and
+            # delete it in the background instead of blocking on rmtree. The
+            # backup lives outside dense_dir so it cannot race with cleanup.
+            backup_dir = Path(dense_dir).parent / f"{Path(dense_dir).name}_images.bak.{os.getpid()}"
+            os.rename(dense_images_dir, backup_dir)
+            threading.Thread(
+                target=shutil.rmtree, args=(backup_dir,), kwargs={"ignore_errors": True}
+            ).start()
     
     # Create symlink to images
     dense_images_dir.symlink_to(images_dir.resolve())
@@ -250,7 +339,14 @@ def step_undistort_images(scene_dir, dense_dir):
     return True
 
 
-def step_interface_colmap(dense_dir, mvs_dir):
+def openmvs_args(max_threads):
+    """Common command line arguments for OpenMVS binaries."""
+    if not max_threads:
+        return []
+    return ["--max-threads", str(max_threads)]
+
+
+def step_interface_colmap(dense_dir, mvs_dir, max_threads=None, env=None):
     """Step 2: Convert COLMAP to MVS format."""
     print("\n" + "="*80)
     print("STEP 2: Converting COLMAP to MVS format")
@@ -268,7 +364,10 @@ def step_interface_colmap(dense_dir, mvs_dir):
         "--image-folder", images_dir
     ]
     
-    success = run_command(cmd, cwd=mvs_dir, description="Converting to MVS format")
+    success = run_command(
+        cmd, cwd=mvs_dir, description="Converting to MVS format",
+        extra_args=openmvs_args(max_threads), env=env
+    )
     
     if not success or not os.path.exists(scene_mvs):
         print("Error: COLMAP to MVS conversion failed")
@@ -278,7 +377,8 @@ def step_interface_colmap(dense_dir, mvs_dir):
     return scene_mvs
 
 
-def step_densify_point_cloud(mvs_dir, scene_mvs):
+def step_densify_point_cloud(mvs_dir, scene_mvs, resolution_level=1, number_views=4,
+                             max_threads=None, env=None):
     """Step 3: Densify point cloud."""
     print("\n" + "="*80)
     print("STEP 3: Densifying point cloud")
@@ -286,10 +386,15 @@ def step_densify_point_cloud(mvs_dir, scene_mvs):
     
     cmd = [
         "DensifyPointCloud",
-        "scene.mvs"
+        "scene.mvs",
+        "--resolution-level", str(resolution_level),
+        "--number-views", str(number_views)
     ]
     
-    success = run_command(cmd, cwd=mvs_dir, description="Densifying point cloud")
+    success = run_command(
+        cmd, cwd=mvs_dir, description="Densifying point cloud",
+        extra_args=openmvs_args(max_threads), env=env
+    )
     
     dense_mvs = os.path.join(mvs_dir, "scene_dense.mvs")
     if not success or not os.path.exists(dense_mvs):
@@ -300,7 +405,7 @@ def step_densify_point_cloud(mvs_dir, scene_mvs):
     return dense_mvs
 
 
-def step_reconstruct_mesh(mvs_dir):
+def step_reconstruct_mesh(mvs_dir, max_threads=None, env=None):
     """Step 4: Reconstruct mesh from dense point cloud."""
     print("\n" + "="*80)
     print("STEP 4: Reconstructing mesh")
@@ -312,7 +417,10 @@ def step_reconstruct_mesh(mvs_dir):
         "-p", "scene_dense.ply"
     ]
     
-    success = run_command(cmd, cwd=mvs_dir, description="Reconstructing mesh")
+    success = run_command(
+        cmd, cwd=mvs_dir, description="Reconstructing mesh",
+        extra_args=openmvs_args(max_threads), env=env
+    )
     
     mesh_ply = os.path.join(mvs_dir, "scene_dense_mesh.ply")
     if not success or not os.path.exists(mesh_ply):
@@ -323,7 +431,7 @@ def step_reconstruct_mesh(mvs_dir):
     return mesh_ply
 
 
-def step_refine_mesh(mvs_dir, max_face_area, refine_scales):
+def step_refine_mesh(mvs_dir, max_face_area, refine_scales, max_threads=None, env=None):
     """Step 5: Refine mesh."""
     print("\n" + "="*80)
     print("STEP 5: Refining mesh")
@@ -338,7 +446,10 @@ def step_refine_mesh(mvs_dir, max_face_area, refine_scales):
         "--max-face-area", str(max_face_area)
     ]
     
-    success = run_command(cmd, cwd=mvs_dir, description="Refining mesh")
+    success = run_command(
+        cmd, cwd=mvs_dir, description="Refining mesh",
+        extra_args=openmvs_args(max_threads), env=env
+    )
     
     refined_mesh = os.path.join(mvs_dir, "scene_dense_mesh_refine.ply")
     if not success or not os.path.exists(refined_mesh):
@@ -349,7 +460,7 @@ def step_refine_mesh(mvs_dir, max_face_area, refine_scales):
     return refined_mesh
 
 
-def step_texture_mesh(mvs_dir):
+def step_texture_mesh(mvs_dir, max_threads=None, env=None):
     """Step 6: Apply texture to mesh."""
     print("\n" + "="*80)
     print("STEP 6: Applying texture to mesh")
@@ -362,7 +473,10 @@ def step_texture_mesh(mvs_dir):
         "-o", "scene_dense_mesh_refine_texture.mvs"
     ]
     
-    success = run_command(cmd, cwd=mvs_dir, description="Texturing mesh")
+    success = run_command(
+        cmd, cwd=mvs_dir, description="Texturing mesh",
+        extra_args=openmvs_args(max_threads), env=env
+    )
     
     textured_mesh = os.path.join(mvs_dir, "scene_dense_mesh_refine_texture.ply")
     if not success or not os.path.exists(textured_mesh):
@@ -373,11 +487,11 @@ def step_texture_mesh(mvs_dir):
     return textured_mesh
 
 
-def create_progress_file(mvs_dir, args):
+def create_progress_file(mvs_dir, scene_dir, args):
     """Create a progress file to track completion."""
     progress = {
         "completed": True,
-        "scene_dir": str(args.scene_dir),
+        "scene_dir": str(scene_dir),
         "max_face_area": args.max_face_area,
         "refine_scales": args.refine_scales,
         "textured": not args.no_texture
@@ -406,23 +520,10 @@ def cleanup_intermediate_files(dense_dir, keep_intermediate):
         print("Intermediate files cleaned up")
 
 
-def main():
-    args = parse_args()
-    
-    print("\n" + "="*80)
-    print("COLMAP to Mesh Conversion using OpenMVS")
-    print("="*80)
-    print(f"Scene directory: {args.scene_dir}")
-    print(f"Max face area: {args.max_face_area}")
-    print(f"Refine scales: {args.refine_scales}")
-    print(f"Texture: {'No' if args.no_texture else 'Yes'}")
-    print("="*80)
-    
-    # Check dependencies
-    check_dependencies()
-    
+def process_scene(scene_dir, args, max_threads=None, env=None):
+    """Run the full OpenMVS pipeline for a single scene."""
     # Setup paths
-    scene_path = Path(args.scene_dir).resolve()
+    scene_path = Path(scene_dir).resolve()
     dense_dir = scene_path / "dense"
     mesh_dir = scene_path / "mesh"
     mvs_dir = mesh_dir / "mvs"
@@ -435,34 +536,42 @@ def main():
         return
     
     # Validate input
-    validate_input_structure(args.scene_dir)
+    validate_input_structure(scene_dir)
     
     # Pipeline execution
     # Step 1: Prepare images (skip undistortion to avoid dimension mismatches)
-    step_undistort_images(args.scene_dir, dense_dir)
+    step_undistort_images(scene_dir, dense_dir)
     
     # Step 2: Convert to MVS format
-    scene_mvs = step_interface_colmap(dense_dir, mvs_dir)
+    scene_mvs = step_interface_colmap(dense_dir, mvs_dir, max_threads=max_threads, env=env)
     
     # Step 3: Densify point cloud
-    step_densify_point_cloud(mvs_dir, scene_mvs)
+    step_densify_point_cloud(
+        mvs_dir, scene_mvs,
+        resolution_level=args.resolution_level,
+        number_views=args.number_views,
+        max_threads=max_threads,
+        env=env
+    )
     
     # Step 4: Reconstruct mesh
-    step_reconstruct_mesh(mvs_dir)
+    step_reconstruct_mesh(mvs_dir, max_threads=max_threads, env=env)
     
     # Step 5: Refine mesh
-    refined_mesh = step_refine_mesh(mvs_dir, args.max_face_area, args.refine_scales)
+    refined_mesh = step_refine_mesh(
+        mvs_dir, args.max_face_area, args.refine_scales, max_threads=max_threads, env=env
+    )
     
     # Step 6: Texture mesh (optional)
     if not args.no_texture:
-        textured_mesh = step_texture_mesh(mvs_dir)
+        textured_mesh = step_texture_mesh(mvs_dir, max_threads=max_threads, env=env)
         final_output = textured_mesh
     else:
         final_output = refined_mesh
         print("\nSkipping texture mapping (--no_texture flag set)")
     
     # Create progress file
-    create_progress_file(mvs_dir, args)
+    create_progress_file(mvs_dir, scene_dir, args)
     
     # Cleanup
     cleanup_intermediate_files(dense_dir, args.keep_intermediate)
@@ -477,14 +586,73 @@ def main():
     if not args.no_texture:
         print("\nTextured mesh files:")
         print(f"- PLY: {final_output}")
-        texture_files = list(Path(mvs_dir).glob("scene_dense_mesh_refine_texture*.png"))
-        if texture_files:
-            print(f"- Textures: {len(texture_files)} files")
+        with os.scandir(mvs_dir) as it:
+            num_textures = sum(
+                1 for entry in it
+                if entry.name.startswith("scene_dense_mesh_refine_texture") and entry.name.endswith(".png")
+            )
+        if num_textures:
+            print(f"- Textures: {num_textures} files")
     else:
         print(f"\nUntextured mesh: {final_output}")
     
     print("\n" + "="*80)
 
 
+def process_scenes_parallel(scene_dirs, args):
+    """Process multiple scenes concurrently, pinning each running scene to one GPU."""
+    num_workers = max(1, min(args.num_gpus, len(scene_dirs)))
+    max_threads = max(1, args.max_threads // num_workers) if args.max_threads else None
+
+    free_gpus = queue.Queue()
+    for gpu_id in range(num_workers):
+        free_gpus.put(gpu_id)
+
+    def run_scene(scene_dir):
+        gpu_id = free_gpus.get()
+        try:
+            env = dict(os.environ, CUDA_VISIBLE_DEVICES=str(gpu_id))
+            print(f"\nProcessing {scene_dir} on GPU {gpu_id}")
+            process_scene(scene_dir, args, max_threads=max_threads, env=env)
+            return True
+        except (SystemExit, Exception) as e:
+            print(f"Error: Processing {scene_dir} failed: {e}")
+            return False
+        finally:
+            free_gpus.put(gpu_id)
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        results = list(executor.map(run_scene, scene_dirs))
+
+    failed = [scene_dir for scene_dir, ok in zip(scene_dirs, results) if not ok]
+    print(f"\nProcessed {len(scene_dirs) - len(failed)}/{len(scene_dirs)} scenes successfully")
+    for scene_dir in failed:
+        print(f"  - Failed: {scene_dir}")
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    args = parse_args()
+    scene_dirs = args.scene_dirs if args.scene_dirs else [args.scene_dir]
+    
+    print("\n" + "="*80)
+    print("COLMAP to Mesh Conversion using OpenMVS")
+    print("="*80)
+    print(f"Scene directories: {', '.join(scene_dirs)}")
+    print(f"Max face area: {args.max_face_area}")
+    print(f"Refine scales: {args.refine_scales}")
+    print(f"Texture: {'No' if args.no_texture else 'Yes'}")
+    print("="*80)
+    
+    # Check dependencies
+    check_dependencies()
+    
+    if len(scene_dirs) == 1:
+        process_scene(scene_dirs[0], args, max_threads=args.max_threads)
+    else:
+        process_scenes_parallel(scene_dirs, args)
+
+
 if __name__ == "__main__":
     main()
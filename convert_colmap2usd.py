@@ -10,6 +10,9 @@ Usage:
 """
 
 import argparse
+import hashlib
+import mmap
+import struct
 import sys
 import numpy as np
 import trimesh
@@ -19,6 +22,11 @@ import pycolmap
 from pxr import Usd, UsdGeom, UsdPhysics, Sdf, UsdShade, Vt
 import open3d as o3d
 
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Convert COLMAP reconstruction to USD")
@@ -39,12 +47,47 @@ def parse_args():
         action="store_true",
         help="Generate mesh from point cloud using Poisson reconstruction"
     )
+    parser.add_argument(
+        "--mesh_method",
+        type=str,
+        default="poisson",
+        choices=["poisson", "delaunay"],
+        help="Meshing method: Poisson or Delaunay graph-cut using COLMAP visibility (default: poisson)"
+    )
     parser.add_argument(
         "--mesh_depth",
         type=int,
         default=9,
         help="Depth parameter for Poisson reconstruction (default: 9)"
     )
+    parser.add_argument(
+        "--voxel_size",
+        type=float,
+        default=0.0,
+        help="Voxel size for downsampling before Poisson; 0 disables, negative uses 1e-3 of the bbox diagonal (default: 0)"
+    )
+    parser.add_argument(
+        "--no_mesh_cache",
+        action="store_true",
+        help="Do not reuse or store Poisson meshes in scene_dir/cache"
+    )
+    parser.add_argument(
+        "--instancer",
+        action="store_true",
+        help="Export the point cloud as a PointInstancer of spheres instead of UsdGeom.Points"
+    )
+    parser.add_argument(
+        "--also_export_obj",
+        action="store_true",
+        help="Also save the generated mesh next to the USD file (format set by --extra_format)"
+    )
+    parser.add_argument(
+        "--extra_format",
+        type=str,
+        default="ply",
+        choices=["obj", "ply", "glb"],
+        help="Format of the additional mesh file written with --also_export_obj (default: ply)"
+    )
     parser.add_argument(
         "--collision_approximation",
         type=str,
@@ -88,7 +131,16 @@ def load_colmap_reconstruction(sparse_dir):
 def load_point_cloud_from_ply(ply_path):
     """Load point cloud from PLY file as fallback."""
     print(f"Loading point cloud from {ply_path}...")
-    mesh = trimesh.load(ply_path)
+    
+    # Open3D parses PLY natively; its colors are already in [0, 1]
+    pcd = o3d.io.read_point_cloud(str(ply_path))
+    if not pcd.is_empty():
+        points = np.asarray(pcd.points, dtype=np.float32)
+        colors = np.asarray(pcd.colors, dtype=np.float32) if pcd.has_colors() else None
+        print(f"Loaded {len(points)} points from PLY")
+        return points, colors
+    
+    mesh = trimesh.load(ply_path, process=False)
     if isinstance(mesh, trimesh.PointCloud):
         points = mesh.vertices
         colors = mesh.colors[:, :3] if mesh.colors is not None else None
@@ -96,27 +148,181 @@ def load_point_cloud_from_ply(ply_path):
         points = mesh.vertices
         colors = mesh.visual.vertex_colors[:, :3] if hasattr(mesh.visual, 'vertex_colors') else None
     
+    # Match reconstruction_to_point_cloud: float32 positions and [0, 1] colors
+    points = np.asarray(points, dtype=np.float32)
+    if colors is not None:
+        colors = np.asarray(colors, dtype=np.float32) / 255.0
+    
     print(f"Loaded {len(points)} points from PLY")
     return points, colors
 
 
+def read_points3D_bin(path):
+    """Read point positions and colors from a COLMAP points3D.bin, skipping the tracks."""
+    # point3D_id, xyz, rgb, error, track_length; followed by track_length (image_id, point2D_idx) pairs
+    header = struct.Struct("<QdddBBBdQ")
+    track_element_size = 8
+    
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        num_points = struct.unpack_from("<Q", buf, 0)[0]
+        points = np.empty((num_points, 3), dtype=np.float32)
+        colors = np.empty((num_points, 3), dtype=np.float32)
+        
+        offset = 8
+        for i in range(num_points):
+            _, x, y, z, r, g, b, _, track_length = header.unpack_from(buf, offset)
+            points[i] = (x, y, z)
+            colors[i] = (r, g, b)
+            offset += header.size + track_element_size * track_length
+    
+    colors *= 1.0 / 255.0
+    print(f"Read {num_points} 3D points from {path}")
+    return points, colors
+
+
 def reconstruction_to_point_cloud(reconstruction):
-    """Convert COLMAP reconstruction to point cloud arrays."""
-    points = []
-    colors = []
-    
-    for point3D_id, point3D in reconstruction.points3D.items():
-        points.append(point3D.xyz)
-        colors.append(point3D.color)
-    
-    points = np.array(points)
-    colors = np.array(colors)
-    
+    """Convert COLMAP reconstruction to float32 point positions and [0, 1] float32 colors."""
+    num_points = len(reconstruction.points3D)
+    points = np.empty((num_points, 3), dtype=np.float32)
+    colors = np.empty((num_points, 3), dtype=np.float32)
+
+    # Fill preallocated arrays directly to avoid intermediate Python lists
+    for i, point3D in enumerate(reconstruction.points3D.values()):
+        points[i] = point3D.xyz
+        colors[i] = point3D.color
+    colors *= 1.0 / 255.0
+
     return points, colors
 
 
-def create_mesh_from_points(points, colors, depth=9):
-    """Create mesh from point cloud using Poisson reconstruction."""
+def collect_point_observations(reconstruction):
+    """Collect the (point index, image index) pairs of all tracks and the camera centers."""
+    image_ids = list(reconstruction.images.keys())
+    image_index = {image_id: i for i, image_id in enumerate(image_ids)}
+    cam_centers = np.array(
+        [reconstruction.images[image_id].projection_center() for image_id in image_ids]
+    )
+
+    point_indices = []
+    image_indices = []
+    for i, point3D in enumerate(reconstruction.points3D.values()):
+        for el in point3D.track.elements:
+            point_indices.append(i)
+            image_indices.append(image_index[el.image_id])
+
+    return (
+        np.asarray(point_indices, dtype=np.int64),
+        np.asarray(image_indices, dtype=np.int64),
+        cam_centers,
+    )
+
+
+def compute_observer_centers(reconstruction):
+    """Compute the mean center of the cameras observing each 3D point."""
+    point_indices, image_indices, cam_centers = collect_point_observations(reconstruction)
+    num_points = len(reconstruction.points3D)
+
+    counts = np.bincount(point_indices, minlength=num_points)
+    sums = np.stack(
+        [np.bincount(point_indices, weights=cam_centers[image_indices, k], minlength=num_points)
+         for k in range(3)],
+        axis=1,
+    )
+    observer_centers = sums / np.maximum(counts, 1)[:, None]
+    # Points without observations fall back to the mean of all cameras
+    observer_centers[counts == 0] = cam_centers.mean(axis=0)
+
+    return observer_centers
+
+
+def estimate_normals_knn(points, k=30, chunk_size=100000):
+    """Estimate normals by PCA over the k nearest neighbors found with FAISS."""
+    xyz = np.ascontiguousarray(points, dtype=np.float32)
+    k = min(k, len(xyz))
+
+    index = faiss.IndexFlatL2(3)
+    if faiss.get_num_gpus() > 0:
+        index = faiss.index_cpu_to_all_gpus(index)
+    index.add(xyz)
+
+    normals = np.empty((len(xyz), 3), dtype=np.float64)
+    for start in range(0, len(xyz), chunk_size):
+        _, neighbor_idx = index.search(xyz[start:start + chunk_size], k)
+        neighbors = xyz[neighbor_idx].astype(np.float64)
+        centered = neighbors - neighbors.mean(axis=1, keepdims=True)
+        cov = np.einsum("nki,nkj->nij", centered, centered)
+        # Eigenvector of the smallest eigenvalue is the surface normal
+        normals[start:start + chunk_size] = np.linalg.eigh(cov)[1][:, :, 0]
+
+    return normals
+
+
+def orient_normals_towards_observers(pcd, points, observer_centers):
+    """Flip normals so that they point towards the cameras observing each point."""
+    normals = np.asarray(pcd.normals)
+    view_dirs = observer_centers - points
+    flip = np.einsum("ij,ij->i", normals, view_dirs) < 0
+    normals[flip] *= -1
+    pcd.normals = o3d.utility.Vector3dVector(normals)
+
+
+def voxel_downsample(points, voxel_size, *attributes):
+    """Average points, and any per-point attribute arrays, that fall into the same voxel."""
+    voxel_coords = np.floor((points - points.min(axis=0)) / voxel_size).astype(np.int64)
+    # Unique rows rather than flat grid indices, which overflow for small voxels
+    _, inverse, counts = np.unique(voxel_coords, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    
+    def average(values):
+        if values is None:
+            return None
+        means = np.stack(
+            [np.bincount(inverse, weights=values[:, k], minlength=len(counts)) for k in range(values.shape[1])],
+            axis=1,
+        ) / counts[:, None]
+        return means.astype(values.dtype)
+    
+    return (average(points),) + tuple(average(values) for values in attributes)
+
+
+def create_mesh_from_points(points, colors, depth=9, reconstruction=None, cache_dir=None, voxel_size=0.0):
+    """
+    Create mesh from point cloud using Poisson reconstruction.
+
+    If voxel_size > 0 the points are voxel-downsampled first; a negative value
+    picks 1e-3 of the bounding box diagonal.
+
+    Returns the trimesh mesh and its (V, 3) uint8 vertex colors (or None).
+    """
+    # Content-addressed cache: identical inputs reuse the previous Poisson output
+    cache_path = None
+    if cache_dir is not None:
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(np.ascontiguousarray(points).tobytes())
+        if colors is not None:
+            hasher.update(np.ascontiguousarray(colors).tobytes())
+        hasher.update(
+            f"depth={depth};visibility={reconstruction is not None};voxel_size={voxel_size}".encode()
+        )
+        cache_path = Path(cache_dir) / f"poisson_{hasher.hexdigest()}.ply"
+        if cache_path.exists():
+            print(f"Loading cached Poisson mesh: {cache_path}")
+            mesh = trimesh.load(str(cache_path), process=False)
+            cached_colors = mesh.visual.vertex_colors[:, :3] if mesh.visual.kind == 'vertex' else None
+            return mesh, cached_colors
+    
+    observer_centers = compute_observer_centers(reconstruction) if reconstruction is not None else None
+    
+    # Downsample to cap the Poisson input size, keeping colors and observers aligned
+    if voxel_size < 0:
+        voxel_size = float(np.linalg.norm(points.max(axis=0) - points.min(axis=0))) * 1e-3
+    if voxel_size > 0:
+        num_input_points = len(points)
+        points, colors, observer_centers = voxel_downsample(
+            points, voxel_size, colors, observer_centers
+        )
+        print(f"Voxel downsampled {num_input_points} -> {len(points)} points (voxel size {voxel_size:.4g})")
+    
     print(f"Creating mesh from {len(points)} points using Poisson reconstruction...")
     
     # Create Open3D point cloud
@@ -124,16 +330,22 @@ def create_mesh_from_points(points, colors, depth=9):
     pcd.points = o3d.utility.Vector3dVector(points)
     
     if colors is not None:
-        # Normalize colors to [0, 1]
-        colors_normalized = colors.astype(np.float64) / 255.0
-        pcd.colors = o3d.utility.Vector3dVector(colors_normalized)
+        # Colors are already normalized to [0, 1]
+        pcd.colors = o3d.utility.Vector3dVector(colors)
     
     # Estimate normals
     print("Estimating normals...")
-    pcd.estimate_normals(
-        search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=0.1, max_nn=30)
-    )
-    pcd.orient_normals_consistent_tangent_plane(30)
+    if faiss is not None:
+        pcd.normals = o3d.utility.Vector3dVector(estimate_normals_knn(points, k=30))
+    else:
+        pcd.estimate_normals(
+            search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=0.1, max_nn=30)
+        )
+    if observer_centers is not None:
+        # Orient normals using camera visibility instead of an MST traversal
+        orient_normals_towards_observers(pcd, points, observer_centers)
+    else:
+        pcd.orient_normals_consistent_tangent_plane(30)
     
     # Poisson reconstruction
     print("Running Poisson surface reconstruction...")
@@ -143,8 +355,11 @@ def create_mesh_from_points(points, colors, depth=9):
     
     # Remove low density vertices
     print("Cleaning mesh...")
-    vertices_to_remove = densities < np.quantile(densities, 0.1)
-    mesh.remove_vertices_by_mask(vertices_to_remove)
+    densities = np.asarray(densities)
+    # O(N) selection of the 10th-percentile density instead of a full quantile
+    kth = int(0.1 * len(densities))
+    threshold = np.partition(densities, kth)[kth]
+    mesh.remove_vertices_by_mask(densities < threshold)
     
     # Convert to trimesh
     vertices = np.asarray(mesh.vertices)
@@ -154,14 +369,386 @@ def create_mesh_from_points(points, colors, depth=9):
     if vertex_colors is not None:
         vertex_colors = (vertex_colors * 255).astype(np.uint8)
     
+    # No processing, so vertex_colors stays aligned with the mesh vertices
     trimesh_mesh = trimesh.Trimesh(
         vertices=vertices,
         faces=faces,
-        vertex_colors=vertex_colors
+        vertex_colors=vertex_colors,
+        process=False
     )
     
     print(f"Generated mesh with {len(vertices)} vertices and {len(faces)} faces")
-    return trimesh_mesh
+    
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        trimesh_mesh.export(str(cache_path))
+        print(f"Cached Poisson mesh: {cache_path}")
+    
+    return trimesh_mesh, vertex_colors
+
+
+# Vertices of facet i of a tetrahedron (the facet opposite its vertex i)
+FACET_VERTICES = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])
+
+
+def tetrahedron_circumspheres(points, tets):
+    """Compute circumcenters and circumradii of tetrahedra (NaN for degenerate ones)."""
+    a = points[tets[:, 0]]
+    u = points[tets[:, 1]] - a
+    v = points[tets[:, 2]] - a
+    w = points[tets[:, 3]] - a
+    vw = np.cross(v, w)
+    wu = np.cross(w, u)
+    uv = np.cross(u, v)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offset = (
+            np.einsum("ij,ij->i", u, u)[:, None] * vw
+            + np.einsum("ij,ij->i", v, v)[:, None] * wu
+            + np.einsum("ij,ij->i", w, w)[:, None] * uv
+        ) / (2.0 * np.einsum("ij,ij->i", u, vw))[:, None]
+    return a + offset, np.linalg.norm(offset, axis=1)
+
+
+def tetrahedralize(points):
+    """Compute the Delaunay tetrahedralization of the points."""
+    from scipy.spatial import Delaunay
+
+    print("Computing Delaunay tetrahedralization...")
+    tri = Delaunay(points)
+    print(f"  {len(tri.simplices)} tetrahedra")
+    return tri
+
+
+def locate_points(tri, start, targets, max_steps=100):
+    """Find the tetrahedra containing targets by walking from start tetrahedra (-1 outside the hull)."""
+    transform = tri.transform
+    found = np.full(len(targets), -1)
+    index = np.flatnonzero(start >= 0)
+    tet = start[index]
+    for _ in range(max_steps):
+        if len(index) == 0:
+            break
+        # Step across the facet with the most negative barycentric coordinate
+        tet_transform = transform[tet]
+        b = np.einsum("nij,nj->ni", tet_transform[:, :3], targets[index] - tet_transform[:, 3])
+        b = np.column_stack([b, 1.0 - b.sum(axis=1)])
+        worst = np.argmin(b, axis=1)
+        inside = b[np.arange(len(index)), worst] >= -1e-12
+        found[index[inside]] = tet[inside]
+        next_tet = tri.neighbors[tet, worst]
+        walk = ~inside & (next_tet >= 0)
+        index = index[walk]
+        tet = next_tet[walk]
+    return found
+
+
+def trace_visibility_rays(tri, points, point_indices, image_indices, cam_centers,
+                          chunk_size=200000, max_steps=10000):
+    """
+    Walk every camera-to-point ray through the tetrahedra it crosses.
+
+    Returns per-tetrahedron counts of rays ending in free space (the tetrahedron
+    holding the camera, or where the ray enters the convex hull) and in solid space
+    (just behind the point), and per-facet counts of rays crossing facet
+    4 * tet + i into tet.
+    """
+    from scipy.spatial import cKDTree
+
+    print("Tracing visibility rays...")
+    num_tets = len(tri.simplices)
+    neighbors = tri.neighbors
+    transform = tri.transform
+    free_counts = np.zeros(num_tets, dtype=np.int32)
+    solid_counts = np.zeros(num_tets, dtype=np.int32)
+    facet_counts = np.zeros(4 * num_tets, dtype=np.int32)
+
+    # Step off each point by a fraction of its nearest neighbor distance to find
+    # the tetrahedra in front of (towards the camera) and behind it
+    nearest = cKDTree(points).query(points, k=2)[0][:, 1]
+
+    stopped = 0
+    for start in range(0, len(point_indices), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        origins = points[point_indices[chunk]]
+        directions = cam_centers[image_indices[chunk]] - origins
+        step = (0.01 * nearest[point_indices[chunk]] / np.linalg.norm(directions, axis=1))[:, None]
+        # Start from a tetrahedron incident to the point, much faster than find_simplex
+        start_tets = tri.vertex_to_simplex[point_indices[chunk]]
+        front = locate_points(tri, start_tets, origins + step * directions)
+        behind = locate_points(tri, start_tets, origins - step * directions)
+        solid_counts += np.bincount(behind[behind >= 0], minlength=num_tets).astype(np.int32)
+
+        # Walk the rays from their point towards the camera in lockstep, collecting
+        # the visited tetrahedra and facets to count them once per chunk
+        free_tets = []
+        crossed_facets = []
+        ray = np.flatnonzero(front >= 0)
+        tet = front[ray]
+        for _ in range(max_steps):
+            if len(ray) == 0:
+                break
+            # Barycentric coordinates along the ray: b(t) = b0 + t * bd, t = 1 at the camera
+            tet_transform = transform[tet]
+            b0 = np.einsum("nij,nj->ni", tet_transform[:, :3], origins[ray] - tet_transform[:, 3])
+            bd = np.einsum("nij,nj->ni", tet_transform[:, :3], directions[ray])
+            b0 = np.column_stack([b0, 1.0 - b0.sum(axis=1)])
+            bd = np.column_stack([bd, -bd.sum(axis=1)])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t_hit = np.where(bd < 0, -b0 / bd, np.inf)
+            exit_facet = np.argmin(t_hit, axis=1)
+            t_exit = t_hit[np.arange(len(ray)), exit_facet]
+            next_tet = neighbors[tet, exit_facet]
+
+            # The camera lies in this tetrahedron, or the ray enters the hull through it
+            free = np.isfinite(t_exit) & ((t_exit >= 1.0) | (next_tet < 0))
+            free_tets.append(tet[free])
+
+            # Otherwise the ray crosses from next_tet into tet (camera to point direction)
+            crossing = np.isfinite(t_exit) & ~free
+            crossed_facets.append(4 * tet[crossing] + exit_facet[crossing])
+
+            ray = ray[crossing]
+            tet = next_tet[crossing]
+        stopped += len(ray)
+
+        if free_tets:
+            free_counts += np.bincount(np.concatenate(free_tets), minlength=num_tets).astype(np.int32)
+            facet_counts += np.bincount(np.concatenate(crossed_facets), minlength=4 * num_tets).astype(np.int32)
+
+    if stopped:
+        print(f"Warning: Stopped tracing {stopped} rays after {max_steps} steps")
+    return free_counts, solid_counts, facet_counts
+
+
+def facet_surface_quality(points, tets, neighbors, facets, chunk_size=1000000):
+    """
+    Surface quality cost of facets 4 * tet + i (Labatut et al. 2009) as float32.
+
+    The cost is 1 - min(cos) of the angles between the facet and the circumspheres
+    of its two tetrahedra, low where both are nearly tangent. Degenerate facets or
+    tetrahedra count as tangent.
+    """
+    centers, radii = tetrahedron_circumspheres(points, tets)
+    quality = np.empty(len(facets), dtype=np.float32)
+
+    for start in range(0, len(facets), chunk_size):
+        facet_tets, facet_opposite = np.divmod(facets[start:start + chunk_size], 4)
+        corners = points[tets[facet_tets[:, None], FACET_VERTICES[facet_opposite]]]
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+
+        def sphere_cosine(sphere_tets):
+            distance = np.abs(np.einsum("ij,ij->i", centers[sphere_tets] - corners[:, 0], normals))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.nan_to_num(np.clip(distance / radii[sphere_tets], 0.0, 1.0), nan=1.0)
+
+        facet_neighbors = neighbors[facet_tets, facet_opposite]
+        cosine = sphere_cosine(facet_tets)
+        cosine = np.where(
+            facet_neighbors >= 0,
+            np.minimum(cosine, sphere_cosine(np.maximum(facet_neighbors, 0))),
+            cosine,
+        )
+        quality[start:start + chunk_size] = 1.0 - cosine
+
+    return quality
+
+
+def solve_visibility_graph_cut(points, tets, neighbors, free_counts, solid_counts, facet_counts,
+                               smoothness=5.0, alpha_vis=32.0):
+    """
+    Label tetrahedra as outside (free space) or inside with an s-t minimum cut.
+
+    Cutting the edge a -> b makes a outside and b inside, so a ray crossing from a
+    into b adds its visibility cost to that edge. Space outside the convex hull is
+    free. Returns a boolean outside mask.
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import breadth_first_order, maximum_flow
+
+    print("Solving graph-cut...")
+    num_tets = len(tets)
+    source, sink = num_tets, num_tets + 1
+
+    # Each interior facet once (from its lower-index tetrahedron), plus hull facets
+    facet_neighbors = neighbors.ravel()
+    facets = np.flatnonzero(facet_neighbors > np.repeat(np.arange(num_tets), 4))
+    hull_facets = np.flatnonzero(facet_neighbors < 0)
+    quality = smoothness * facet_surface_quality(points, tets, neighbors, np.concatenate([facets, hull_facets]))
+    hull_quality = np.bincount(hull_facets // 4, weights=quality[len(facets):], minlength=num_tets)
+    quality = quality[:len(facets)]
+
+    # The same facet seen from the neighboring tetrahedron
+    tet, other = facets // 4, facet_neighbors[facets]
+    twins = 4 * other + np.argmax(neighbors[other] == tet[:, None], axis=1)
+
+    rows = np.concatenate([tet, other, np.full(num_tets, source), np.arange(num_tets)])
+    cols = np.concatenate([other, tet, np.arange(num_tets), np.full(num_tets, sink)])
+    caps = np.concatenate([
+        quality + alpha_vis * facet_counts[twins],
+        quality + alpha_vis * facet_counts[facets],
+        alpha_vis * free_counts + hull_quality,
+        alpha_vis * solid_counts,
+    ])
+    del quality, hull_quality, twins, tet, other
+
+    # maximum_flow needs integer capacities
+    caps = np.minimum(np.rint(caps * 16), np.iinfo(np.int32).max).astype(np.int32)
+    keep = caps > 0
+    graph = csr_matrix(
+        (caps[keep], (rows[keep].astype(np.int32), cols[keep].astype(np.int32))),
+        shape=(num_tets + 2, num_tets + 2),
+    )
+    del rows, cols, caps, keep
+    flow = maximum_flow(graph, source, sink).flow
+
+    # Tetrahedra reachable from the source in the residual graph are outside
+    residual = (graph - flow).tocsr()
+    del graph, flow
+    residual.data = (residual.data > 0).astype(np.int8)
+    residual.eliminate_zeros()
+    reachable = breadth_first_order(residual, source, directed=True, return_predecessors=False)
+    outside = np.zeros(num_tets + 2, dtype=bool)
+    outside[reachable] = True
+    return outside[:num_tets]
+
+
+def extract_manifold_surface(points, tets, neighbors, outside, max_iterations=50):
+    """
+    Extract the faces between inside and outside tetrahedra (or the hull) as a manifold mesh.
+
+    Isolated single tetrahedra are relabeled first. Inside tetrahedra touching
+    only along an edge pinch the surface into a
+    non-manifold edge; the smaller-volume side of the tetrahedra around such edges
+    is flipped. Inside regions touching only at a vertex get one copy of the vertex
+    per fan of faces. Returns the source point index of each vertex and the faces,
+    oriented away from the inside.
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    num_points = len(points)
+    facet_tets = np.repeat(np.arange(len(tets)), 4)
+    facet_opposite = np.tile(np.arange(4), len(tets))
+    facet_neighbors = neighbors.ravel()
+    corner_pairs = np.array([[0, 1], [1, 2], [0, 2]])
+    tet_edges = np.array([[0, 1], [0, 2], [0, 3], [1, 2], [1, 3], [2, 3]])
+
+    # Single tetrahedra whose neighbors all have the other label are noise
+    neighbor_outside = np.where(neighbors >= 0, outside[np.maximum(neighbors, 0)], True)
+    outside = outside.copy()
+    outside[~outside & neighbor_outside.all(axis=1)] = True
+    outside[outside & ~neighbor_outside.any(axis=1)] = False
+
+    for _ in range(max_iterations):
+        neighbor_outside = np.where(facet_neighbors >= 0, outside[np.maximum(facet_neighbors, 0)], True)
+        surface = np.flatnonzero(~outside[facet_tets] & neighbor_outside)
+        faces = tets[facet_tets[surface, None], FACET_VERTICES[facet_opposite[surface]]]
+        pairs = faces[:, corner_pairs]
+        order = np.argsort(pairs, axis=2)
+        face_edges = np.take_along_axis(pairs, order, axis=2).reshape(-1, 2)
+        keys = face_edges[:, 0].astype(np.int64) * num_points + face_edges[:, 1]
+        unique_keys, counts = np.unique(keys, return_counts=True)
+        pinched_edges = unique_keys[counts > 2]
+        if len(pinched_edges) == 0:
+            break
+
+        # Tetrahedra around the pinched edges
+        endpoints = np.zeros(num_points, dtype=bool)
+        endpoints[np.concatenate([pinched_edges // num_points, pinched_edges % num_points])] = True
+        candidates = np.flatnonzero(endpoints[tets].sum(axis=1) >= 2)
+        ring = np.sort(tets[candidates][:, tet_edges], axis=2)
+        ring_keys = ring[..., 0].astype(np.int64) * num_points + ring[..., 1]
+        on_edge = np.isin(ring_keys, pinched_edges)
+        ring_tets = np.broadcast_to(candidates[:, None], ring_keys.shape)[on_edge]
+        _, ring_edge = np.unique(ring_keys[on_edge], return_inverse=True)
+
+        # Flip whichever side of the edge (inside or outside tetrahedra) has less volume
+        corners = points[tets[ring_tets]]
+        volumes = np.abs(np.einsum(
+            "ij,ij->i",
+            corners[:, 1] - corners[:, 0],
+            np.cross(corners[:, 2] - corners[:, 0], corners[:, 3] - corners[:, 0]),
+        ))
+        ring_inside = ~outside[ring_tets]
+        inside_volume = np.bincount(ring_edge, weights=volumes * ring_inside)
+        outside_volume = np.bincount(ring_edge, weights=volumes * ~ring_inside)
+        fill = (outside_volume <= inside_volume)[ring_edge]
+        outside[ring_tets[fill & ~ring_inside]] = False
+        outside[ring_tets[~fill & ring_inside]] = True
+
+    surface_tets = facet_tets[surface]
+    surface_opposite = facet_opposite[surface]
+    del facet_tets, facet_opposite
+
+    vertex_ids = np.arange(num_points)
+    if len(pinched_edges):
+        print(f"Warning: {len(pinched_edges)} non-manifold edges remain")
+    elif len(faces):
+        # Every edge has two faces; link the face corners at each vertex across
+        # shared edges, a vertex with several corner fans is split
+        corners = 3 * np.arange(len(faces))[:, None, None] + corner_pairs
+        corners = np.take_along_axis(corners, order, axis=2).reshape(-1, 2)
+        by_edge = np.argsort(keys, kind="stable")
+        first, second = corners[by_edge[0::2]], corners[by_edge[1::2]]
+        fan_graph = csr_matrix(
+            (np.ones(2 * len(first), dtype=np.int8), (first.ravel(), second.ravel())),
+            shape=(3 * len(faces), 3 * len(faces)),
+        )
+        _, fan_labels = connected_components(fan_graph, directed=False)
+        fans, fan_index = np.unique(
+            faces.ravel().astype(np.int64) * 3 * len(faces) + fan_labels, return_inverse=True
+        )
+        vertex_ids = fans // (3 * len(faces))
+        faces = fan_index.reshape(-1, 3)
+
+    # Orient faces away from the inside tetrahedron
+    vertices = points[vertex_ids]
+    a, b, c = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    inner = points[tets[surface_tets, surface_opposite]]
+    flip = np.einsum("ij,ij->i", np.cross(b - a, c - a), inner - a) > 0
+    faces[flip] = faces[flip][:, ::-1]
+
+    return vertex_ids, faces
+
+
+def create_mesh_from_points_delaunay(points, colors, reconstruction, smoothness=5.0):
+    """
+    Create mesh from point cloud using Delaunay tetrahedralization and a visibility graph-cut.
+
+    Every camera-to-point ray is walked through the tetrahedra it crosses to vote
+    free and solid space, then a minimum cut with a surface quality term weighted
+    by smoothness (Labatut et al. 2009) separates inside from outside.
+
+    Returns the trimesh mesh and its (V, 3) uint8 vertex colors (or None).
+    """
+    print(f"Creating mesh from {len(points)} points using Delaunay graph-cut...")
+    points = np.asarray(points, dtype=np.float64)
+
+    tri = tetrahedralize(points)
+    tets, neighbors = tri.simplices, tri.neighbors
+    counts = trace_visibility_rays(tri, points, *collect_point_observations(reconstruction))
+    # Only the connectivity is needed from here on
+    del tri
+
+    outside = solve_visibility_graph_cut(points, tets, neighbors, *counts, smoothness=smoothness)
+    del counts
+    vertex_ids, faces = extract_manifold_surface(points, tets, neighbors, outside)
+
+    vertex_colors = (colors[vertex_ids] * 255).astype(np.uint8) if colors is not None else None
+    trimesh_mesh = trimesh.Trimesh(
+        vertices=points[vertex_ids],
+        faces=faces,
+        vertex_colors=vertex_colors,
+        process=False
+    )
+    trimesh_mesh.remove_unreferenced_vertices()
+
+    print(f"Generated mesh with {len(trimesh_mesh.vertices)} vertices and {len(trimesh_mesh.faces)} faces")
+    if colors is None:
+        return trimesh_mesh, None
+    return trimesh_mesh, trimesh_mesh.visual.vertex_colors[:, :3]
 
 
 def create_usd_from_point_cloud(points, colors, output_path, args):
@@ -181,28 +768,50 @@ def create_usd_from_point_cloud(points, colors, output_path, args):
     geom_path = "/World/Geometry"
     stage.DefinePrim(geom_path, "Xform")
     
-    # Create point instancer
     points_path = f"{geom_path}/PointCloud"
-    points_prim = UsdGeom.PointInstancer.Define(stage, points_path)
+    num_points = len(points)
     
-    # Set point positions
-    points_np = np.asarray(points, dtype=np.float32)
-    points_prim.GetPositionsAttr().Set(Vt.Vec3fArray.FromNumpy(points_np))
+    if not args.instancer:
+        # Plain points: positions, widths and colors only, no per-point indirection
+        points_prim = UsdGeom.Points.Define(stage, points_path)
+        points_prim.SetWidthsInterpolation(UsdGeom.Tokens.constant)
+        primvar = points_prim.CreateDisplayColorPrimvar(UsdGeom.Tokens.vertex) if colors is not None else None
+        
+        # Author the array values in one change block to batch USD notifications
+        with Sdf.ChangeBlock():
+            points_prim.GetPointsAttr().Set(Vt.Vec3fArray.FromNumpy(points))
+            # A single constant width of 0.02 matches the 0.01 radius of the instancer sphere
+            points_prim.GetWidthsAttr().Set(Vt.FloatArray([0.02]))
+            if primvar is not None:
+                primvar.Set(Vt.Vec3fArray.FromNumpy(colors))
+        
+        stage.Save()
+        print(f"USD file saved: {output_path}")
+        return
     
-    # Set point colors if available
+    # Create point instancer
+    points_prim = UsdGeom.PointInstancer.Define(stage, points_path)
+    
+    # Create color primvar if available
+    primvar = None
     if colors is not None:
-        colors_normalized = colors.astype(np.float32) / 255.0
         primvars_api = UsdGeom.PrimvarsAPI(points_prim.GetPrim())
         primvar = primvars_api.CreatePrimvar(
             "displayColor",
             Sdf.ValueTypeNames.Color3fArray
         )
-        primvar.Set(Vt.Vec3fArray.FromNumpy(colors_normalized))
     
-    # Set point IDs
-    num_points = len(points)
-    points_prim.GetProtoIndicesAttr().Set([0] * num_points)
-    points_prim.GetIdsAttr().Set(list(range(num_points)))
+    proto_indices = np.zeros(num_points, dtype=np.int32)
+    ids = np.arange(num_points, dtype=np.int64)
+    
+    with Sdf.ChangeBlock():
+        # Set point positions (already contiguous float32)
+        points_prim.GetPositionsAttr().Set(Vt.Vec3fArray.FromNumpy(points))
+        if primvar is not None:
+            primvar.Set(Vt.Vec3fArray.FromNumpy(colors))
+        # Set point IDs
+        points_prim.GetProtoIndicesAttr().Set(Vt.IntArray.FromNumpy(proto_indices))
+        points_prim.GetIdsAttr().Set(Vt.Int64Array.FromNumpy(ids))
     
     # Create a small sphere as prototype
     proto_path = f"{points_path}/Prototypes/Sphere"
@@ -216,8 +825,8 @@ def create_usd_from_point_cloud(points, colors, output_path, args):
     print(f"USD file saved: {output_path}")
 
 
-def create_usd_from_mesh(mesh, output_path, args):
-    """Create USD file from mesh with physics properties."""
+def create_usd_from_mesh(mesh, output_path, args, vertex_colors=None):
+    """Create USD file from mesh with physics properties and optional (V, 3) uint8 vertex colors."""
     print(f"Creating USD file with mesh: {output_path}")
     
     # Create USD stage
@@ -246,23 +855,26 @@ def create_usd_from_mesh(mesh, output_path, args):
     vertices_np = np.asarray(vertices, dtype=np.float32)
     
     # USD expects flattened face indices
-    face_vertex_counts = [3] * len(faces)
-    face_vertex_indices = faces.flatten()
-    
-    usd_mesh.GetPointsAttr().Set(Vt.Vec3fArray.FromNumpy(vertices_np))
-    usd_mesh.GetFaceVertexCountsAttr().Set(Vt.IntArray(face_vertex_counts))
-    usd_mesh.GetFaceVertexIndicesAttr().Set(Vt.IntArray(face_vertex_indices.tolist()))
+    face_vertex_counts = np.full(len(faces), 3, dtype=np.int32)
+    face_vertex_indices = np.ascontiguousarray(faces, dtype=np.int32).ravel()
     
-    # Set vertex colors if available
-    if mesh.visual.vertex_colors is not None:
-        colors = mesh.visual.vertex_colors[:, :3].astype(np.float32) / 255.0
+    # Create color primvar if available, normalizing the uint8 buffer exactly once
+    primvar = None
+    if vertex_colors is not None:
+        colors = vertex_colors[:, :3].astype(np.float32) * (1.0 / 255.0)
         primvars_api = UsdGeom.PrimvarsAPI(usd_mesh.GetPrim())
         primvar = primvars_api.CreatePrimvar(
             "displayColor",
             Sdf.ValueTypeNames.Color3fArray,
             UsdGeom.Tokens.vertex
         )
-        primvar.Set(Vt.Vec3fArray.FromNumpy(colors))
+    
+    with Sdf.ChangeBlock():
+        usd_mesh.GetPointsAttr().Set(Vt.Vec3fArray.FromNumpy(vertices_np))
+        usd_mesh.GetFaceVertexCountsAttr().Set(Vt.IntArray.FromNumpy(face_vertex_counts))
+        usd_mesh.GetFaceVertexIndicesAttr().Set(Vt.IntArray.FromNumpy(face_vertex_indices))
+        if primvar is not None:
+            primvar.Set(Vt.Vec3fArray.FromNumpy(colors))
     
     # Add collision properties
     if args.collision_approximation != "none":
@@ -311,17 +923,27 @@ def main():
     else:
         output_path = sparse_dir / "scene.usd"
     
-    # Load COLMAP reconstruction
-    reconstruction = load_colmap_reconstruction(str(sparse_dir))
+    points3D_bin = sparse_dir / "points3D.bin"
+    if not args.use_mesh and points3D_bin.exists():
+        # Point cloud export only needs XYZ/RGB: skip images.bin and the tracks
+        points, colors = read_points3D_bin(points3D_bin)
+        reconstruction = None
+    else:
+        # Load COLMAP reconstruction
+        reconstruction = load_colmap_reconstruction(str(sparse_dir))
+        if len(reconstruction.points3D) > 0:
+            points, colors = reconstruction_to_point_cloud(reconstruction)
+        else:
+            points, colors = None, None
     
     # Get point cloud
-    if len(reconstruction.points3D) > 0:
-        points, colors = reconstruction_to_point_cloud(reconstruction)
-    else:
+    if points is None or len(points) == 0:
         # Try to load from PLY as fallback
         ply_path = sparse_dir / "points.ply"
         if ply_path.exists():
             points, colors = load_point_cloud_from_ply(str(ply_path))
+            # PLY points carry no visibility information
+            reconstruction = None
         else:
             print("Error: No 3D points found in reconstruction")
             sys.exit(1)
@@ -337,14 +959,24 @@ def main():
 
     # Create USD file
     if args.use_mesh:        
-        mesh = create_mesh_from_points(points, colors, depth=args.mesh_depth)
+        if args.mesh_method == "delaunay" and reconstruction is not None:
+            mesh, mesh_colors = create_mesh_from_points_delaunay(points, colors, reconstruction)
+        else:
+            if args.mesh_method == "delaunay":
+                print("Warning: No visibility information available, falling back to Poisson reconstruction")
+            mesh, mesh_colors = create_mesh_from_points(
+                points, colors, depth=args.mesh_depth, reconstruction=reconstruction,
+                cache_dir=None if args.no_mesh_cache else scene_dir / "cache",
+                voxel_size=args.voxel_size
+            )
         if mesh is not None:
-            create_usd_from_mesh(mesh, output_path, args)
+            create_usd_from_mesh(mesh, output_path, args, vertex_colors=mesh_colors)
             
-            # Also save mesh as OBJ for reference
-            obj_path = output_path.with_suffix('.obj')
-            mesh.export(str(obj_path))
-            print(f"Mesh also saved as OBJ: {obj_path}")
+            # Optionally save the mesh in an additional format for reference
+            if args.also_export_obj:
+                extra_path = output_path.with_suffix('.' + args.extra_format)
+                mesh.export(str(extra_path))
+                print(f"Mesh also saved as {args.extra_format.upper()}: {extra_path}")
         else:
             print("Error: Failed to create mesh")
             sys.exit(1)
@@ -6,31 +6,92 @@ Usage:
     python convert_heif2png.py <input_directory> [output_directory]
     
 If output_directory is not specified, PNG files will be saved in the same directory as input files.
+
+PNG files are written with zlib level 1 by default, which is several times faster
+than Pillow's default level 6 at the cost of roughly 10% larger files. Use
+--png-level 6 (or 9) for smaller output.
 """
 
+import os
 import sys
+import queue
 import argparse
+import itertools
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from io import BytesIO
 from pathlib import Path
+import numpy as np
 from PIL import Image
 import pillow_heif
 
-# Register HEIF opener with PIL
-pillow_heif.register_heif_opener()
+try:
+    import imagecodecs
+except ImportError:
+    imagecodecs = None
+
+# Print full tracebacks on failed conversions (set by --debug)
+DEBUG = False
+
 
+def init_worker(debug: bool = False) -> None:
+    """Register HEIF opener with PIL and set the traceback flag once per worker."""
+    global DEBUG
+    DEBUG = debug
+    pillow_heif.register_heif_opener()
 
-def convert_heif_to_png(input_path: Path, output_path: Path) -> bool:
+
+def decode_heif(source):
     """
-    Convert a single HEIF/HEIC file to PNG.
+    Decode the primary image of a HEIF/HEIC file.
     
     Args:
-        input_path: Path to input HEIF/HEIC file
-        output_path: Path to output PNG file
+        source: Path to a HEIF/HEIC file or a file-like object with its bytes
         
     Returns:
-        True if conversion succeeded, False otherwise
+        Decoded primary pillow_heif image with raw pixel data
     """
-    try:
-        heif_file = pillow_heif.read_heif(str(input_path))
+    # open_heif is lazy; decode only the primary image instead of every
+    # top-level image as read_heif does
+    heif_file = pillow_heif.open_heif(source, convert_hdr_to_8bit=True)
+    primary = heif_file[heif_file.primary_index]
+    primary.load()
+    return primary
+
+
+def heif_to_array(heif_file) -> np.ndarray:
+    """
+    View decoded HEIF pixel data as an (H, W, C) uint8 array without copying.
+    
+    Args:
+        heif_file: Decoded pillow_heif image in 8-bit 'RGB' or 'RGBA' mode
+        
+    Returns:
+        Array view over heif_file.data with the row stride padding stripped
+    """
+    width, height = heif_file.size
+    channels = len(heif_file.mode)
+    rows = np.frombuffer(heif_file.data, dtype=np.uint8).reshape(height, heif_file.stride)
+    return rows[:, :width * channels].reshape(height, width, channels)
+
+
+def save_png(heif_file, output_path: Path, compress_level: int = 1,
+             encoder: str = 'pillow') -> None:
+    """
+    Encode a decoded HEIF image as PNG.
+    
+    Args:
+        heif_file: Decoded pillow_heif image
+        output_path: Path to output PNG file
+        compress_level: zlib compression level (0-9)
+        encoder: 'pillow' or 'imagecodecs'
+    """
+    if encoder == 'imagecodecs':
+        # Encode straight from the HEIF pixel buffer, skipping the PIL image copy
+        png_data = imagecodecs.png_encode(heif_to_array(heif_file), level=compress_level)
+        Path(output_path).write_bytes(png_data)
+    else:
         image = Image.frombytes(
             heif_file.mode,
             heif_file.size,
@@ -39,15 +100,137 @@ def convert_heif_to_png(input_path: Path, output_path: Path) -> bool:
             heif_file.mode,
             heif_file.stride,
         )
-        image.save(str(output_path), 'PNG')
+        image.save(str(output_path), 'PNG', compress_level=compress_level)
+
+
+def convert_heif_to_png(input_path: Path, output_path: Path, compress_level: int = 1,
+                        encoder: str = 'pillow') -> bool:
+    """
+    Convert a single HEIF/HEIC file to PNG.
+    
+    Args:
+        input_path: Path to input HEIF/HEIC file
+        output_path: Path to output PNG file
+        compress_level: zlib compression level (0-9)
+        encoder: PNG encoder, 'pillow' or 'imagecodecs'
+        
+    Returns:
+        True if conversion succeeded, False otherwise
+    """
+    try:
+        heif_file = decode_heif(str(input_path))
+        save_png(heif_file, output_path, compress_level, encoder)
         print(f'✓ {input_path.name} -> {output_path.name}')
         return True
     except Exception as e:
         print(f'✗ Failed to convert {input_path.name}: {e}')
+        if DEBUG:
+            traceback.print_exc()
         return False
 
 
-def convert_directory(input_dir: str, output_dir: str = None, replace: bool = False) -> None:
+def convert_files_parallel(heif_files, png_paths, num_workers: int, compress_level: int = 1,
+                           encoder: str = 'pillow'):
+    """
+    Convert heif_files[i] to png_paths[i] on a process pool.
+    
+    Yields:
+        (input_path, success) tuples in input order
+    """
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker,
+                             initargs=(DEBUG,)) as executor:
+        # Dispatch in small chunks to cut per-task IPC while keeping the load balanced
+        results = executor.map(
+            convert_heif_to_png,
+            heif_files,
+            png_paths,
+            itertools.repeat(compress_level),
+            itertools.repeat(encoder),
+            chunksize=4,
+        )
+        yield from zip(heif_files, results)
+
+
+def convert_files_pipelined(heif_files, png_paths, num_threads: int, compress_level: int = 1,
+                            encoder: str = 'pillow'):
+    """
+    Convert heif_files[i] to png_paths[i] with overlapped read, decode and encode stages.
+    
+    Each stage runs on its own thread pool connected by bounded queues, so disk
+    reads and PNG writes overlap with HEVC decoding. libheif and libpng release
+    the GIL, so the stages run concurrently.
+    
+    Yields:
+        (input_path, success) tuples in completion order
+    """
+    num_io_threads = 2 * num_threads
+    decode_queue = queue.Queue(maxsize=2 * num_threads)
+    encode_queue = queue.Queue(maxsize=2 * num_threads)
+    results = queue.Queue()
+    
+    def fail(heif_path, e):
+        print(f'✗ Failed to convert {heif_path.name}: {e}')
+        if DEBUG:
+            traceback.print_exception(type(e), e, e.__traceback__)
+        results.put((heif_path, False))
+    
+    def read_stage(heif_path, png_path):
+        try:
+            data = heif_path.read_bytes()
+        except Exception as e:
+            fail(heif_path, e)
+            return
+        decode_queue.put((heif_path, png_path, data))
+    
+    def decode_stage():
+        while (item := decode_queue.get()) is not None:
+            heif_path, png_path, data = item
+            try:
+                heif_file = decode_heif(BytesIO(data))
+            except Exception as e:
+                fail(heif_path, e)
+                continue
+            encode_queue.put((heif_path, png_path, heif_file))
+    
+    def encode_stage():
+        while (item := encode_queue.get()) is not None:
+            heif_path, png_path, heif_file = item
+            try:
+                save_png(heif_file, png_path, compress_level, encoder)
+            except Exception as e:
+                fail(heif_path, e)
+                continue
+            print(f'✓ {heif_path.name} -> {png_path.name}')
+            results.put((heif_path, True))
+    
+    with ThreadPoolExecutor(max_workers=num_io_threads) as readers, \
+            ThreadPoolExecutor(max_workers=num_threads) as decoders, \
+            ThreadPoolExecutor(max_workers=num_io_threads) as encoders:
+        decode_futures = [decoders.submit(decode_stage) for _ in range(num_threads)]
+        encode_futures = [encoders.submit(encode_stage) for _ in range(num_io_threads)]
+        read_futures = [
+            readers.submit(read_stage, heif_path, png_path)
+            for heif_path, png_path in zip(heif_files, png_paths)
+        ]
+        
+        def close_stages():
+            # Shut each stage down once the previous one has drained
+            wait(read_futures)
+            for _ in decode_futures:
+                decode_queue.put(None)
+            wait(decode_futures)
+            for _ in encode_futures:
+                encode_queue.put(None)
+        
+        threading.Thread(target=close_stages, daemon=True).start()
+        
+        for _ in range(len(heif_files)):
+            yield results.get()
+
+
+def convert_directory(input_dir: str, output_dir: str = None, replace: bool = False,
+                      workers: int = None, compress_level: int = 1,
+                      encoder: str = 'pillow') -> None:
     """
     Convert all HEIF/HEIC files in a directory to PNG.
     
@@ -55,6 +238,9 @@ def convert_directory(input_dir: str, output_dir: str = None, replace: bool = Fa
         input_dir: Input directory path
         output_dir: Output directory path (optional)
         replace: If True, replace original HEIF files with PNG files
+        workers: Number of worker processes (None uses all CPUs, 0 uses a thread pool)
+        compress_level: PNG zlib compression level (0-9)
+        encoder: PNG encoder, 'pillow' or 'imagecodecs'
     """
     input_path = Path(input_dir)
     
@@ -73,11 +259,13 @@ def convert_directory(input_dir: str, output_dir: str = None, replace: bool = Fa
     else:
         output_path = input_path
     
-    # Find all HEIF/HEIC files (case-insensitive)
-    heif_extensions = ['.heif', '.heic', '.HEIF', '.HEIC']
-    heif_files = []
-    for ext in heif_extensions:
-        heif_files.extend(input_path.glob(f'*{ext}'))
+    # Find all HEIF/HEIC files (case-insensitive) in a single directory pass
+    with os.scandir(input_path) as it:
+        heif_files = [
+            Path(entry.path) for entry in it
+            if entry.is_file()
+            and entry.name.lower().endswith(('.heif', '.heic'))
+        ]
     
     if not heif_files:
         print(f'No HEIF/HEIC files found in "{input_dir}"')
@@ -95,15 +283,22 @@ def convert_directory(input_dir: str, output_dir: str = None, replace: bool = Fa
     # Determine the number of digits needed for zero-padding
     num_digits = len(str(len(heif_files) - 1))
     
-    for idx, heif_file in enumerate(heif_files):
-        # Create PNG filename with zero-padded index
-        png_filename = f'{idx:0{num_digits}d}.png'
-        png_path = output_path / png_filename
-        
-        # Convert
-        if convert_heif_to_png(heif_file, png_path):
+    # Create PNG filenames with zero-padded index
+    png_name = f'{{:0{num_digits}d}}.png'.format
+    png_paths = [output_path / png_name(idx) for idx in range(len(heif_files))]
+    
+    # HEVC decode and PNG encode are CPU-bound, so convert files in parallel.
+    # With --workers 0 a pipelined thread pool is used instead of processes.
+    if workers == 0:
+        results = convert_files_pipelined(heif_files, png_paths, os.cpu_count(), compress_level, encoder)
+    else:
+        results = convert_files_parallel(heif_files, png_paths, workers or os.cpu_count(),
+                                         compress_level, encoder)
+    
+    for heif_file, success in results:
+        if success:
             success_count += 1
-            # Delete original HEIF file if replace mode is enabled
+            # Delete original HEIF file if replace mode is enabled (in the parent process only)
             if replace and output_path == input_path:
                 try:
                     heif_file.unlink()
@@ -159,13 +354,57 @@ Examples:
         help='Replace original HEIF files with PNG files (only works when output_dir is not specified)'
     )
     
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of worker processes (default: number of CPUs, 0 uses pipelined threads instead of processes)'
+    )
+    
+    parser.add_argument(
+        '--png-level',
+        type=int,
+        default=1,
+        choices=range(10),
+        metavar='{0-9}',
+        help='PNG zlib compression level: lower is faster, higher gives smaller files (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--fast-encoder',
+        type=str,
+        default='pillow',
+        choices=['pillow', 'imagecodecs'],
+        help='PNG encoder to use (default: pillow; imagecodecs must be installed)'
+    )
+    
+    parser.add_argument(
+        '--debug',
+        action='store_true',
+        help='Print full tracebacks for failed conversions'
+    )
+    
     args = parser.parse_args()
     
+    global DEBUG
+    DEBUG = args.debug
+    
+    if args.fast_encoder == 'imagecodecs' and imagecodecs is None:
+        print('Error: --fast-encoder imagecodecs requires the imagecodecs package.')
+        sys.exit(1)
+    
     if args.replace and args.output_dir:
         print('Warning: --replace option is ignored when output_dir is specified.')
         args.replace = False
     
-    convert_directory(args.input_dir, args.output_dir, args.replace)
+    convert_directory(
+        args.input_dir,
+        args.output_dir,
+        args.replace,
+        args.workers,
+        args.png_level,
+        args.fast_encoder,
+    )
 
 
 if __name__ == '__main__':
@@ -8,33 +8,55 @@ and converts it to USD format with optional physics properties.
 Usage:
     python convert_mesh2usd.py --input mesh/mvs/scene_dense.ply
     python convert_mesh2usd.py --input mesh/mvs/scene_dense.ply --output scene.usd
+    python convert_mesh2usd.py --input mesh/mvs/scene_dense.ply --usd_format ascii
     python convert_mesh2usd.py --input mesh/mvs/scene_dense_mesh_refine.ply --export_obj
+    python convert_mesh2usd.py --input_glob 'mesh/*/scene_dense.ply' --workers 4
 """
 
 import argparse
+import gc
+import glob
+import os
 import sys
+import traceback
 import numpy as np
 import trimesh
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from pathlib import Path
 
 from pxr import Usd, UsdGeom, UsdPhysics, Sdf, UsdShade, Vt
 
+# Print full tracebacks on errors (set by --debug)
+DEBUG = False
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
         description="Convert mesh file to USD/OBJ format"
     )
-    parser.add_argument(
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument(
         "--input",
         type=str,
-        required=True,
         help="Input mesh file (PLY, OBJ, etc.)"
     )
+    input_group.add_argument(
+        "--input_glob",
+        type=str,
+        help="Glob pattern of input mesh files to convert in batch mode (quote it)"
+    )
     parser.add_argument(
         "--output",
         type=str,
         default=None,
-        help="Output file path (default: same as input with .usd or .obj extension)"
+        help="Output file path (default: same as input with .usd or .obj extension; ignored with --input_glob)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of meshes converted concurrently with --input_glob (default: number of CPUs)"
     )
     parser.add_argument(
         "--export_obj",
@@ -46,6 +68,13 @@ def parse_args():
         action="store_true",
         help="Export both USD and OBJ formats"
     )
+    parser.add_argument(
+        "--usd_format",
+        type=str,
+        default="crate",
+        choices=["crate", "ascii"],
+        help="USD file format: binary crate or ASCII (.usda) (default: crate; .usd files are written as crate)"
+    )
     parser.add_argument(
         "--collision_approximation",
         type=str,
@@ -77,6 +106,16 @@ def parse_args():
         default=None,
         help="Simplify mesh to target number of faces (optional)"
     )
+    parser.add_argument(
+        "--process_mesh",
+        action="store_true",
+        help="Let trimesh merge vertices and clean the mesh on load (slower on large meshes)"
+    )
+    parser.add_argument(
+        "--verbose_stats",
+        action="store_true",
+        help="Print expensive mesh statistics such as watertightness"
+    )
     parser.add_argument(
         "--up_axis",
         type=str,
@@ -84,15 +123,49 @@ def parse_args():
         choices=["X", "Y", "Z"],
         help="Up axis for USD (default: Z)"
     )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Print full tracebacks on errors"
+    )
     return parser.parse_args()
 
 
-def load_mesh(input_path):
-    """Load mesh from file."""
+def set_debug(enabled):
+    """Set the module-level traceback flag (also used as a worker initializer)."""
+    global DEBUG
+    DEBUG = enabled
+
+
+def concatenate_meshes(meshes):
+    """Concatenate meshes by stacking their arrays, without trimesh's re-processing."""
+    # Textured parts need their UVs stacked and materials merged, which trimesh handles
+    if any(m.visual.kind == 'texture' for m in meshes):
+        return trimesh.util.concatenate(meshes)
+    
+    vertices = [m.vertices for m in meshes]
+    offsets = np.cumsum([0] + [len(v) for v in vertices[:-1]])
+    faces = np.vstack([m.faces + offset for m, offset in zip(meshes, offsets)])
+    
+    # Keep vertex colors if any mesh has them (trimesh fills in defaults for the others)
+    vertex_colors = None
+    if any(m.visual.kind == 'vertex' for m in meshes):
+        vertex_colors = np.vstack([m.visual.vertex_colors for m in meshes])
+    
+    return trimesh.Trimesh(
+        vertices=np.vstack(vertices),
+        faces=faces,
+        vertex_colors=vertex_colors,
+        process=False
+    )
+
+
+def load_mesh(input_path, process=False, load_materials=True, verbose_stats=False):
+    """Load mesh from file, skipping trimesh's cleanup passes unless process is set."""
     print(f"Loading mesh from: {input_path}")
     
     try:
-        mesh = trimesh.load(input_path)
+        mesh = trimesh.load(input_path, process=process, skip_materials=not load_materials)
         
         # Handle scene objects (multiple meshes)
         if isinstance(mesh, trimesh.Scene):
@@ -105,7 +178,7 @@ def load_mesh(input_path):
             elif len(meshes) == 1:
                 mesh = meshes[0]
             else:
-                mesh = trimesh.util.concatenate(meshes)
+                mesh = concatenate_meshes(meshes)
                 print(f"Combined {len(meshes)} meshes into one")
         
         print(f"Loaded mesh with {len(mesh.vertices)} vertices and {len(mesh.faces)} faces")
@@ -114,10 +187,16 @@ def load_mesh(input_path):
         print("\nMesh statistics:")
         print(f"  Vertices: {len(mesh.vertices)}")
         print(f"  Faces: {len(mesh.faces)}")
-        print(f"  Is watertight: {mesh.is_watertight}")
-        print(f"  Bounding box min: {mesh.bounds[0]}")
-        print(f"  Bounding box max: {mesh.bounds[1]}")
-        print(f"  Extents: {mesh.extents}")
+        if verbose_stats:
+            # Requires a full edge-adjacency analysis, expensive on large meshes
+            print(f"  Is watertight: {mesh.is_watertight}")
+        # One min/max pass over the vertices for bounds and extents
+        vertices = mesh.vertices
+        bounds_min = vertices.min(axis=0)
+        bounds_max = vertices.max(axis=0)
+        print(f"  Bounding box min: {bounds_min}")
+        print(f"  Bounding box max: {bounds_max}")
+        print(f"  Extents: {bounds_max - bounds_min}")
         
         if mesh.visual.kind == 'vertex':
             print("Has vertex colors: Yes")
@@ -128,18 +207,50 @@ def load_mesh(input_path):
         
     except Exception as e:
         print(f"Error loading mesh: {e}")
-        import traceback
-        traceback.print_exc()
+        if DEBUG:
+            traceback.print_exc()
         return None
 
 
+def simplify_mesh_open3d(mesh, target_faces):
+    """Quadric decimation with Open3D's parallel C++ implementation, keeping vertex colors."""
+    # Imported here since open3d is slow to import and only needed for --simplify
+    import open3d as o3d
+    
+    o3d_mesh = o3d.geometry.TriangleMesh(
+        o3d.utility.Vector3dVector(np.asarray(mesh.vertices, dtype=np.float64)),
+        o3d.utility.Vector3iVector(np.asarray(mesh.faces, dtype=np.int32))
+    )
+    has_colors = mesh.visual.kind == 'vertex'
+    if has_colors:
+        o3d_mesh.vertex_colors = o3d.utility.Vector3dVector(
+            mesh.visual.vertex_colors[:, :3] / 255.0
+        )
+    
+    simplified = o3d_mesh.simplify_quadric_decimation(target_faces)
+    
+    vertex_colors = None
+    if has_colors:
+        vertex_colors = (np.asarray(simplified.vertex_colors) * 255.0).round().astype(np.uint8)
+    
+    return trimesh.Trimesh(
+        vertices=np.asarray(simplified.vertices),
+        faces=np.asarray(simplified.triangles),
+        vertex_colors=vertex_colors,
+        process=False
+    )
+
+
 def simplify_mesh(mesh, target_faces):
     """Simplify mesh to target number of faces."""
     print(f"\nSimplifying mesh from {len(mesh.faces)} to ~{target_faces} faces...")
     
     try:
-        # Use quadric decimation for better quality
-        simplified = mesh.simplify_quadric_decimation(target_faces)
+        # Use quadric decimation for better quality, preferring Open3D when available
+        try:
+            simplified = simplify_mesh_open3d(mesh, target_faces)
+        except ImportError:
+            simplified = mesh.simplify_quadric_decimation(target_faces)
         print(f"Simplified to {len(simplified.faces)} faces ({len(simplified.vertices)} vertices)")
         return simplified
     except Exception as e:
@@ -157,25 +268,29 @@ def export_obj(mesh, output_path):
         mesh.export(str(output_path))
         print(f"Successfully exported OBJ: {output_path}")
         
+        # List the output directory once for the MTL and texture checks
+        with os.scandir(output_path.parent) as it:
+            file_names = frozenset(entry.name for entry in it if entry.is_file())
+        
         # Check for MTL and texture files
         mtl_path = output_path.with_suffix('.mtl')
-        if mtl_path.exists():
+        if mtl_path.name in file_names:
             print(f"  Material file: {mtl_path}")
         
-        # List any texture files in the same directory
-        texture_files = []
-        for ext in ['.png', '.jpg', '.jpeg']:
-            texture_files.extend(output_path.parent.glob(f"*{ext}"))
+        # Count any texture files in the same directory
+        texture_count = sum(
+            1 for name in file_names if name.lower().endswith(('.png', '.jpg', '.jpeg'))
+        )
         
-        if texture_files:
-            print(f"  Found {len(texture_files)} texture files in directory")
+        if texture_count:
+            print(f"  Found {texture_count} texture files in directory")
         
         return True
         
     except Exception as e:
         print(f"Error exporting OBJ: {e}")
-        import traceback
-        traceback.print_exc()
+        if DEBUG:
+            traceback.print_exc()
         return False
 
 
@@ -184,8 +299,8 @@ def export_usd(mesh, output_path, args):
     print(f"\nExporting to USD: {output_path}")
     
     try:
-        # Create USD stage
-        stage = Usd.Stage.CreateNew(str(output_path))
+        # Author the stage in memory and write the file once at the end
+        stage = Usd.Stage.CreateInMemory()
         
         # Set up axis
         if args.up_axis == "Z":
@@ -214,27 +329,45 @@ def export_usd(mesh, output_path, args):
         usd_mesh = UsdGeom.Mesh.Define(stage, mesh_path)
         
         # Set mesh data
-        vertices = mesh.vertices.astype(np.float32)
+        # Only copy when the dtype or layout doesn't already match what Vt expects
+        vertices = mesh.vertices
+        if vertices.dtype != np.float32 or not vertices.flags.c_contiguous:
+            vertices = np.ascontiguousarray(vertices, dtype=np.float32)
         faces = mesh.faces
         
-        # USD expects flattened face indices
-        face_vertex_counts = [len(face) for face in faces]
-        face_vertex_indices = faces.flatten()
-        
-        usd_mesh.GetPointsAttr().Set(Vt.Vec3fArray.FromNumpy(vertices))
-        usd_mesh.GetFaceVertexCountsAttr().Set(Vt.IntArray(face_vertex_counts))
-        usd_mesh.GetFaceVertexIndicesAttr().Set(Vt.IntArray(face_vertex_indices.tolist()))
+        # USD expects flattened int32 face indices (trimesh faces are uniform triangles)
+        face_vertex_counts = np.full(len(faces), faces.shape[1], dtype=np.int32)
+        face_vertex_indices = faces.reshape(-1)
+        if face_vertex_indices.dtype != np.int32 or not face_vertex_indices.flags.c_contiguous:
+            face_vertex_indices = np.ascontiguousarray(face_vertex_indices, dtype=np.int32)
         
-        # Set vertex colors if available
+        # Create color primvar if vertex colors are available
+        primvar = None
+        colors = None
         if mesh.visual.kind == 'vertex' and hasattr(mesh.visual, 'vertex_colors'):
-            colors = mesh.visual.vertex_colors[:, :3].astype(np.float32) / 255.0
+            # Scale uint8 colors to [0, 1] float32 in a single pass
+            src = mesh.visual.vertex_colors[:, :3]
+            colors = np.empty(src.shape, dtype=np.float32)
+            np.multiply(src, np.float32(1.0 / 255.0), out=colors, casting='unsafe')
             primvars_api = UsdGeom.PrimvarsAPI(usd_mesh.GetPrim())
             primvar = primvars_api.CreatePrimvar(
                 "displayColor",
                 Sdf.ValueTypeNames.Color3fArray,
                 UsdGeom.Tokens.vertex
             )
-            primvar.Set(Vt.Vec3fArray.FromNumpy(colors))
+        
+        with Sdf.ChangeBlock():
+            usd_mesh.GetPointsAttr().Set(Vt.Vec3fArray.FromNumpy(vertices))
+            usd_mesh.GetFaceVertexCountsAttr().Set(Vt.IntArray.FromNumpy(face_vertex_counts))
+            usd_mesh.GetFaceVertexIndicesAttr().Set(Vt.IntArray.FromNumpy(face_vertex_indices))
+            if primvar is not None:
+                primvar.Set(Vt.Vec3fArray.FromNumpy(colors))
+        
+        # The Vt arrays hold their own copies, so release the converted NumPy
+        # buffers before saving (arrays that are views of the mesh stay alive)
+        del vertices, face_vertex_counts, face_vertex_indices, colors
+        
+        if primvar is not None:
             print("  Added vertex colors")
         
         # Handle texture materials
@@ -267,8 +400,10 @@ def export_usd(mesh, output_path, args):
             
             print(f"  Physics material: friction={args.static_friction}, restitution={args.restitution}")
         
-        # Save stage
-        stage.Save()
+        # Write the single root layer as is (format follows the output extension);
+        # Stage.Export would flatten it first
+        if not stage.GetRootLayer().Export(str(output_path)):
+            raise RuntimeError(f"Failed to write USD file: {output_path}")
         print(f"Successfully exported USD: {output_path}")
         
         # Print file info
@@ -279,19 +414,76 @@ def export_usd(mesh, output_path, args):
         
     except Exception as e:
         print(f"Error exporting USD: {e}")
-        import traceback
-        traceback.print_exc()
+        if DEBUG:
+            traceback.print_exc()
         return False
 
 
-def main():
-    args = parse_args()
+def share_array(array):
+    """Copy an array into a new shared memory block and return the block and its spec."""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def export_usd_shared(vertices_spec, faces_spec, colors_spec, output_path, args):
+    """Rebuild a lightweight mesh from shared memory arrays and export it to USD."""
+    blocks = []
     
-    # Validate input
-    input_path = Path(args.input)
-    if not input_path.exists():
-        print(f"Error: Input file not found: {input_path}")
-        sys.exit(1)
+    def attach(spec):
+        if spec is None:
+            return None
+        name, shape, dtype = spec
+        shm = shared_memory.SharedMemory(name=name)
+        blocks.append(shm)
+        return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    
+    mesh = trimesh.Trimesh(
+        vertices=attach(vertices_spec),
+        faces=attach(faces_spec),
+        vertex_colors=attach(colors_spec),
+        process=False
+    )
+    try:
+        return export_usd(mesh, output_path, args)
+    finally:
+        # Drop every view into the shared buffers before detaching
+        del mesh
+        gc.collect()
+        for shm in blocks:
+            shm.close()
+
+
+def export_both_parallel(mesh, obj_path, usd_path, args):
+    """Export OBJ in this process while a worker process writes the USD from shared memory."""
+    colors = mesh.visual.vertex_colors if mesh.visual.kind == 'vertex' else None
+    blocks = []
+    specs = []
+    for array in (mesh.vertices, mesh.faces, colors):
+        if array is None:
+            specs.append(None)
+            continue
+        shm, spec = share_array(np.asarray(array))
+        blocks.append(shm)
+        specs.append(spec)
+    
+    try:
+        with ProcessPoolExecutor(max_workers=1, initializer=set_debug, initargs=(DEBUG,)) as executor:
+            usd_future = executor.submit(export_usd_shared, *specs, usd_path, args)
+            # The OBJ export keeps the full mesh, including texture materials
+            success_obj = export_obj(mesh, obj_path)
+            success_usd = usd_future.result()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    
+    return success_obj, success_usd
+
+
+def process_one(input_path, args):
+    """Load, optionally simplify and export a single mesh. Returns True on success."""
+    input_path = Path(input_path)
     
     # Determine output paths
     if args.output:
@@ -299,7 +491,13 @@ def main():
     else:
         output_base = input_path.with_suffix('')
     
-    usd_output = output_base.with_suffix('.usd')
+    # .usd is written as binary crate; keep an explicit USD output suffix as given
+    if args.usd_format == "ascii":
+        usd_output = output_base.with_suffix('.usda')
+    elif args.output and Path(args.output).suffix.lower() in ('.usd', '.usdc', '.usda'):
+        usd_output = Path(args.output)
+    else:
+        usd_output = output_base.with_suffix('.usd')
     obj_output = output_base.with_suffix('.obj')
     
     print("="*80)
@@ -318,28 +516,76 @@ def main():
     print("="*80)
     
     # Load mesh
-    mesh = load_mesh(input_path)
+    # Materials/textures are only used by the OBJ export
+    mesh = load_mesh(
+        input_path,
+        process=args.process_mesh,
+        load_materials=args.export_obj or args.export_both,
+        verbose_stats=args.verbose_stats
+    )
     if mesh is None:
-        sys.exit(1)
+        return False
     
     # Simplify if requested
     if args.simplify is not None:
-        mesh = simplify_mesh(mesh, args.simplify)
+        simplified = simplify_mesh(mesh, args.simplify)
+        # Release the full-resolution mesh before exporting
+        del mesh
+        gc.collect()
+        mesh = simplified
     
     # Export
-    success = True
-    
     if args.export_both:
-        # Export both formats
-        success_obj = export_obj(mesh, obj_output)
-        success_usd = export_usd(mesh, usd_output, args)
-        success = success_obj or success_usd
+        # Export both formats concurrently
+        success_obj, success_usd = export_both_parallel(mesh, obj_output, usd_output, args)
+        return success_obj or success_usd
     elif args.export_obj:
         # Export OBJ only
-        success = export_obj(mesh, obj_output)
+        return export_obj(mesh, obj_output)
     else:
         # Export USD only
-        success = export_usd(mesh, usd_output, args)
+        return export_usd(mesh, usd_output, args)
+
+
+def process_files_parallel(input_paths, args):
+    """Convert several meshes concurrently, one worker process per mesh."""
+    num_workers = max(1, min(args.workers or os.cpu_count(), len(input_paths)))
+    
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=set_debug, initargs=(DEBUG,)) as executor:
+        # Meshes vary widely in size, so hand them out one at a time
+        results = list(executor.map(process_one, input_paths, [args] * len(input_paths), chunksize=1))
+    
+    failed = [path for path, ok in zip(input_paths, results) if not ok]
+    print(f"\nConverted {len(input_paths) - len(failed)}/{len(input_paths)} meshes successfully")
+    for path in failed:
+        print(f"  - Failed: {path}")
+    return not failed
+
+
+def main():
+    args = parse_args()
+    set_debug(args.debug)
+    
+    if args.input_glob:
+        input_paths = sorted(glob.glob(args.input_glob))
+        if not input_paths:
+            print(f"Error: No input files match: {args.input_glob}")
+            sys.exit(1)
+        if args.output:
+            print("Warning: --output is ignored with --input_glob.")
+            args.output = None
+        
+        if not process_files_parallel(input_paths, args):
+            sys.exit(1)
+        return
+    
+    # Validate input
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"Error: Input file not found: {input_path}")
+        sys.exit(1)
+    
+    success = process_one(input_path, args)
     
     if success:
         print("\n" + "="*80)